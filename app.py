@@ -1,20 +1,55 @@
+import time
+
+_SCRIPT_T0 = time.perf_counter()
+
+import hashlib
+import logging
 import os
 import re
-import uuid
+from typing import Optional
+
 import streamlit as st
-from moviepy import AudioFileClip
 
-from modules.downloader import MusicDownloader
+# Heavy backends (moviepy, yt_dlp, bs4, Pillow) are imported inside the functions
+# that need them so cold start and every rerun only pay for Streamlit itself.
 from modules.lyrics import LyricEngine
-from modules.mixer import AudioMixer
-from modules.video_engine import VideoEngine
+from modules.workspace import DEFAULT_RUNS_ROOT, OutputStore, RunLockedError, RunWorkspace, prune_stale_runs
 
 st.set_page_config(page_title="Mixset Lyric Video Generator", layout="wide")
 st.title("🎬 Mixset Lyric Video Generator")
 st.caption("곡 검색 → 구간/가사 설정 → 믹싱/영상 생성까지 한 번에 처리합니다.")
 
-# Initialize downloader
-DOWNLOADER = MusicDownloader(output_dir="downloads")
+_FIRST_PAINT_MS = (time.perf_counter() - _SCRIPT_T0) * 1000
+
+logger = logging.getLogger("mixset.app")
+
+
+@st.cache_resource
+def get_downloader():
+    from modules.downloader import MusicDownloader
+
+    return MusicDownloader(output_dir="downloads")
+
+
+@st.cache_resource
+def get_output_store() -> OutputStore:
+    # Finished mixes/videos; old and least recently used files are garbage-collected
+    return OutputStore(root="outputs")
+
+
+@st.cache_resource
+def get_pcm_cache():
+    # Decoded source tracks (memory-mapped); point PCM_CACHE_DIR at a shared volume to reuse across hosts
+    from modules.pcm_cache import PCMCache
+
+    return PCMCache(cache_dir=os.environ.get("PCM_CACHE_DIR", "pcm_cache"))
+
+
+OUTPUT_STORE = get_output_store()
+LYRIC_ENGINE = LyricEngine()
+CROSSFADE_SEC = 4.0
+# Resumable run directories (checkpoints, frames, chunks); kept only until the run succeeds
+RUNS_ROOT = DEFAULT_RUNS_ROOT
 
 if "queue" not in st.session_state:
     st.session_state.queue = []
@@ -29,11 +64,9 @@ def infer_lyrics_mode(lyrics_text: str) -> str:
 
 
 def get_audio_duration(audio_path: str) -> float:
+    # Decoding through the PCM cache also warms it for previews and the final mix
     try:
-        clip = AudioFileClip(audio_path)
-        duration = float(clip.duration)
-        clip.close()
-        return max(duration, 1.0)
+        return max(get_pcm_cache().duration(audio_path), 1.0)
     except Exception:
         return 180.0
 
@@ -65,67 +98,94 @@ def validate_queue(items: list[dict]) -> list[str]:
     return errors
 
 
-def generate_mix_and_video() -> None:
+def preview_transition(index: int) -> bytes:
+    from modules.mixer import AudioMixer
+
+    mixer = AudioMixer(pcm_cache=get_pcm_cache())
+    for item in st.session_state.queue[index:index + 2]:
+        mixer.add_track(item["audio_path"], item["start"], item["end"])
+    return mixer.preview_transition(0, crossfade_sec=CROSSFADE_SEC)
+
+
+def save_background(uploaded_file, workspace: RunWorkspace) -> Optional[str]:
+    if uploaded_file is None:
+        return None
+    path = workspace.file("background" + os.path.splitext(uploaded_file.name)[1])
+    with open(path, "wb") as f:
+        f.write(uploaded_file.getbuffer())
+    return path
+
+
+def generate_mix_and_video(backend: str = "concat", parallel_render: bool = False, bg_upload=None) -> None:
+    from modules.pipeline import job_fingerprint
+    from modules.video_engine import VideoEngine
+
     validation_errors = validate_queue(st.session_state.queue)
     if validation_errors:
         for msg in validation_errors:
             st.error(msg)
         return
 
-    status = st.empty()
-    progress = st.progress(0)
+    backend_options = {"segment_sec": 60} if backend == "concat" and parallel_render else {}
+    video_engine = VideoEngine(backend=backend, **backend_options)
 
-    mixer = AudioMixer()
-    lyric_engine = LyricEngine()
-    video_engine = VideoEngine()
+    # Same queue/settings -> same run directory, so a failed or interrupted run resumes
+    bg_digest = hashlib.sha1(bg_upload.getvalue()).hexdigest() if bg_upload is not None else None
+    run_id = job_fingerprint(st.session_state.queue, CROSSFADE_SEC, video_engine, extra=bg_digest)[:12]
 
-    # 1) Mix audio
-    status.text("Step 1/3: 오디오 믹싱 중...")
-    progress.progress(10)
+    try:
+        with RunWorkspace(root=RUNS_ROOT, name=run_id, keep_on_failure=True) as workspace:
+            if not run_pipeline(workspace, run_id, video_engine, bg_upload):
+                workspace.keep()
+    except RunLockedError:
+        st.warning("같은 설정의 작업이 다른 세션에서 이미 진행 중입니다. 완료된 후 다시 시도해주세요.")
+        return
 
-    lrc_payloads = []
-    for item in st.session_state.queue:
-        mixer.add_track(item["audio_path"], item["start"], item["end"])
-        lrc_payloads.append({"text": item["lyrics_raw"], "mode": item.get("lyrics_mode", "plain")})
+    OUTPUT_STORE.gc(protect=st.session_state.last_output.values())
+    prune_stale_runs(RUNS_ROOT)
 
-    mixed_audio, mix_log = mixer.process_mix(crossfade_sec=4.0)
-    if not mixed_audio:
-        st.error("믹싱에 실패했습니다. 선택한 구간/오디오 파일을 확인해주세요.")
-        return
 
-    run_id = uuid.uuid4().hex[:8]
-    mix_output = f"final_mix_{run_id}.mp3"
-    video_output = f"final_result_{run_id}.mp4"
+def run_pipeline(workspace: RunWorkspace, run_id: str, video_engine, bg_upload) -> bool:
+    from modules.pipeline import PipelineError, run_mix_pipeline
 
-    try:
-        mixer.export(mixed_audio, mix_output)
-    finally:
-        try:
-            mixed_audio.close()
-        except Exception:
-            pass
+    status = st.empty()
+    progress = st.progress(0)
 
-    st.audio(mix_output)
-    progress.progress(45)
+    def report(percent: int, message: str) -> None:
+        status.text(message)
+        progress.progress(percent)
 
-    # 2) Process lyrics
-    status.text("Step 2/3: 가사 타이밍 처리 중...")
-    processed_lyrics = lyric_engine.process_mix_lyrics(lrc_payloads, mix_log)
-    translated_lyrics = lyric_engine.translate_lines(processed_lyrics)
-    progress.progress(70)
+    mix_output = OUTPUT_STORE.path_for(f"final_mix_{run_id}.mp3")
+    video_output = OUTPUT_STORE.path_for(f"final_result_{run_id}.mp4")
 
-    # 3) Render video
-    status.text("Step 3/3: 영상 렌더링 중...")
     try:
-        video_engine.create_video(mix_output, translated_lyrics, video_output)
-        progress.progress(100)
-        status.text("완료!")
-
-        st.session_state.last_output = {"audio": mix_output, "video": video_output}
-        st.success("영상 생성이 완료되었습니다.")
-        st.video(video_output)
+        run_mix_pipeline(
+            st.session_state.queue,
+            mix_output,
+            video_output,
+            crossfade_sec=CROSSFADE_SEC,
+            video_engine=video_engine,
+            pcm_cache=get_pcm_cache(),
+            bg_image_path=save_background(bg_upload, workspace),
+            work_dir=workspace.subdir("frames"),
+            checkpoint_dir=workspace.path,
+            progress=report,
+        )
+    except PipelineError as exc:
+        st.error(str(exc))
+        return False
     except Exception as exc:
+        if os.path.exists(mix_output):
+            st.audio(mix_output)
         st.error(f"렌더링 실패: {exc}")
+        st.info("완료된 단계는 저장되었습니다. 같은 설정으로 다시 생성하면 이어서 진행합니다.")
+        return False
+
+    st.session_state.last_output = {"audio": mix_output, "video": video_output}
+    st.success("영상 생성이 완료되었습니다.")
+    st.audio(mix_output)
+    st.video(video_output)
+    return True
 
 
 # Tabs
@@ -151,7 +211,7 @@ with search_tab:
             st.warning("검색어를 입력해주세요.")
         else:
             with st.spinner(f"'{search_query}' 검색 중..."):
-                genie_results = DOWNLOADER.search_genie(search_query)
+                genie_results = get_downloader().search_genie(search_query)
 
             if not genie_results:
                 st.warning("검색 결과가 없습니다. 키워드를 바꿔보세요.")
@@ -162,8 +222,8 @@ with search_tab:
                     with st.expander(label):
                         if st.button("이 곡 큐에 추가", key=f"add_{item['id']}"):
                             with st.spinner("오디오/가사 수집 중..."):
-                                lyrics = DOWNLOADER.get_genie_lyrics(item["id"]) or ""
-                                audio_path, _ = DOWNLOADER.download_audio_from_youtube(label)
+                                lyrics = get_downloader().get_genie_lyrics(item["id"]) or ""
+                                audio_path, _ = get_downloader().download_audio_from_youtube(label)
 
                             if not audio_path:
                                 st.error("유튜브 오디오 다운로드에 실패했습니다.")
@@ -206,6 +266,13 @@ with config_tab:
                 if st.button("이 항목 제거", key=f"remove_{i}"):
                     remove_indices.append(i)
 
+                if i + 1 < len(st.session_state.queue) and end > start:
+                    if st.button("▶ 다음 곡으로 넘어가는 구간 미리듣기", key=f"preview_{i}"):
+                        try:
+                            st.audio(preview_transition(i), format="audio/wav")
+                        except Exception as exc:
+                            st.error(f"미리듣기 실패: {exc}")
+
             with c2:
                 mode = st.selectbox(
                     "가사 모드",
@@ -231,8 +298,24 @@ with generate_tab:
     st.subheader("최종 생성")
     st.write("모든 설정을 마친 뒤 아래 버튼을 눌러 믹스 오디오와 가사 영상을 생성하세요.")
 
+    render_backends = {
+        "PNG concat (기본)": "concat",
+        "Raw pipe (PNG 저장 없이 바로 인코딩)": "pipe",
+        "자막 burn-in (ASS, 단어별 카라오케 하이라이트)": "subtitles",
+    }
+    backend_label = st.selectbox("렌더링 방식", list(render_backends))
+    backend = render_backends[backend_label]
+    parallel_render = st.checkbox(
+        "병렬 렌더링 (긴 믹스셋용, 구간별로 나눠 동시에 인코딩)",
+        value=False,
+        disabled=backend != "concat",
+    )
+    if backend != "subtitles" and any(LYRIC_ENGINE.has_word_timing(i["lyrics_raw"]) for i in st.session_state.queue):
+        st.info("단어별 타이밍(<mm:ss.xx>)이 있는 가사가 있습니다. 카라오케 하이라이트는 자막 burn-in 방식에서만 표시됩니다.")
+    bg_upload = st.file_uploader("배경 이미지 (선택)", type=["png", "jpg", "jpeg"])
+
     if st.button("생성 시작", type="primary"):
-        generate_mix_and_video()
+        generate_mix_and_video(backend, parallel_render, bg_upload)
 
     if st.session_state.last_output:
         st.markdown("---")
@@ -240,6 +323,18 @@ with generate_tab:
         audio_file = st.session_state.last_output.get("audio")
         video_file = st.session_state.last_output.get("video")
         if audio_file and os.path.exists(audio_file):
+            OUTPUT_STORE.touch(audio_file)
             st.audio(audio_file)
         if video_file and os.path.exists(video_file):
+            OUTPUT_STORE.touch(video_file)
             st.video(video_file)
+
+
+# Script-side timing (first paint = page header sent, total = whole rerun).
+# bench_startup.py checks the cold-start numbers against a budget.
+_TOTAL_MS = (time.perf_counter() - _SCRIPT_T0) * 1000
+if "startup_logged" not in st.session_state:
+    st.session_state.startup_logged = True
+    logger.info("startup: first paint %.0f ms, full script %.0f ms", _FIRST_PAINT_MS, _TOTAL_MS)
+else:
+    logger.debug("rerun: first paint %.0f ms, full script %.0f ms", _FIRST_PAINT_MS, _TOTAL_MS)
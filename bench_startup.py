@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark for the Streamlit app.
+
+Runs app.py once per fresh interpreter with Streamlit's AppTest, records how
+long the first script run takes (and the first-paint time the app logs), and
+checks that the app itself did not eagerly import any heavy backend (modules
+Streamlit already loads on its own are not counted).
+
+    python bench_startup.py                  # 5 cold runs, default budget
+    python bench_startup.py --runs 10 --budget-ms 800
+
+Exits with status 1 when the median run exceeds the budget or a heavy module
+was imported at startup, so it can gate CI as features are added.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Must only be imported by the actions that need them (search, preview, generate)
+HEAVY_MODULES = ("moviepy", "yt_dlp", "bs4", "requests", "PIL", "numpy", "scipy", "openai")
+
+
+class _StartupLogCapture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.first_paint_ms = None
+
+    def emit(self, record):
+        if record.msg.startswith("startup:"):
+            self.first_paint_ms = record.args[0]
+
+
+def measure_once():
+    """
+    Runs in a fresh interpreter: returns timings and eagerly imported heavy modules.
+    """
+    capture = _StartupLogCapture()
+    app_logger = logging.getLogger("mixset.app")
+    app_logger.setLevel(logging.INFO)
+    app_logger.addHandler(capture)
+
+    started = time.perf_counter()
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+    streamlit_ms = (time.perf_counter() - started) * 1000
+    # Whatever Streamlit loads itself is not the app's cost
+    preloaded = set(sys.modules)
+
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    started = time.perf_counter()
+    app.run()
+    script_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "streamlit_import_ms": streamlit_ms,
+        "script_ms": script_ms,
+        "first_paint_ms": capture.first_paint_ms,
+        "heavy_modules": sorted(
+            name for name in HEAVY_MODULES
+            if any(m == name or m.startswith(name + ".") for m in set(sys.modules) - preloaded)
+        ),
+        "exceptions": [str(e.value) for e in app.exception],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Streamlit cold start of app.py.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold runs (fresh interpreters)")
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="Maximum median duration of the first script run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return 0
+
+    results = []
+    for _ in range(max(1, args.runs)):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            capture_output=True, text=True, cwd=os.path.dirname(APP_PATH),
+        )
+        if proc.returncode != 0:
+            print(proc.stderr)
+            return 1
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    script_ms = statistics.median(r["script_ms"] for r in results)
+    paint = [r["first_paint_ms"] for r in results if r["first_paint_ms"] is not None]
+    heavy = sorted({m for r in results for m in r["heavy_modules"]})
+    exceptions = sorted({e for r in results for e in r["exceptions"]})
+
+    print(f"streamlit import : {statistics.median(r['streamlit_import_ms'] for r in results):.0f} ms (median)")
+    print(f"first script run : {script_ms:.0f} ms (median, budget {args.budget_ms:.0f} ms)")
+    if paint:
+        print(f"first paint      : {statistics.median(paint):.0f} ms (median, logged by app.py)")
+
+    failed = False
+    if script_ms > args.budget_ms:
+        print("FAIL: first script run is over budget")
+        failed = True
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if exceptions:
+        print(f"FAIL: app raised during startup: {'; '.join(exceptions)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
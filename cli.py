@@ -0,0 +1,265 @@
+"""
+Headless renderer: runs the AudioMixer -> LyricEngine -> VideoEngine pipeline
+from manifest files, without Streamlit.
+
+    python cli.py manifests/ --jobs 4 --output-dir outputs
+    python cli.py nightly/set_01.json
+
+Manifest (JSON, or YAML if PyYAML is installed); relative paths are resolved
+against the manifest's directory:
+
+    {
+      "name": "set_01",
+      "crossfade_sec": 4.0,
+      "render": {"backend": "concat", "segment_sec": 60, "workers": 4, "fps": 30, "bg_image": "bg.png"},
+      "timeline": {"priority": "outgoing", "min_duration_ms": 800, "short_policy": "merge", "gap_fill": "title"},
+      "tracks": [
+        {"audio_path": "a.mp3", "start": 30, "end": 90, "lyrics_file": "a.lrc"},
+        {"audio_path": "b.mp3", "start": 0, "end": 60, "lyrics": "...", "lyrics_mode": "plain"}
+      ]
+    }
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from modules.lyrics import LyricEngine
+from modules.workspace import DEFAULT_RUNS_ROOT, RunWorkspace, prune_stale_runs
+
+MANIFEST_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+def load_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"PyYAML is required for YAML manifests: {path}")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    if not isinstance(manifest, dict) or not manifest.get("tracks"):
+        raise ValueError(f"Manifest has no tracks: {path}")
+    return manifest
+
+
+def manifest_name(manifest, path):
+    """
+    Output basename of a manifest: its "name", or the file name.
+    """
+    return manifest.get("name") or os.path.splitext(os.path.basename(path))[0]
+
+
+def check_unique_names(manifest_paths):
+    """
+    Raises ValueError if two manifests would write the same output files.
+    Unreadable manifests are left to fail on their own when rendered.
+    """
+    seen = {}
+    duplicates = []
+    for path in manifest_paths:
+        try:
+            name = manifest_name(load_manifest(path), path)
+        except (OSError, ValueError):
+            continue
+        if name in seen:
+            duplicates.append(f"'{name}' ({seen[name]}, {path})")
+        else:
+            seen[name] = path
+    if duplicates:
+        raise ValueError(f"Duplicate manifest names would overwrite each other's outputs: {'; '.join(duplicates)}")
+
+
+def collect_manifests(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(MANIFEST_EXTENSIONS):
+                    found.append(os.path.join(path, name))
+        else:
+            found.append(path)
+    return found
+
+
+def manifest_tracks(manifest, base_dir, lyric_engine):
+    """
+    Converts manifest tracks to the queue item dicts the pipeline expects.
+    """
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    tracks = []
+    for idx, track in enumerate(manifest["tracks"], start=1):
+        if "audio_path" not in track or "end" not in track:
+            raise ValueError(f"Track {idx} needs audio_path and end")
+
+        lyrics = track.get("lyrics", "")
+        if track.get("lyrics_file"):
+            with open(resolve(track["lyrics_file"]), "r", encoding="utf-8") as f:
+                lyrics = f.read()
+
+        mode = track.get("lyrics_mode") or ("lrc" if lyric_engine.has_timestamps(lyrics) else "plain")
+        tracks.append({
+            "title": track.get("title", os.path.basename(track["audio_path"])),
+            "audio_path": resolve(track["audio_path"]),
+            "lyrics_raw": lyrics,
+            "lyrics_mode": mode,
+            "start": float(track.get("start", 0.0)),
+            "end": float(track["end"]),
+        })
+    return tracks
+
+
+class BatchRenderer:
+    """
+    Renders manifests with up to `jobs` pipelines in flight.
+
+    Each job runs in its own worker process, since mixing, frame drawing and
+    audio export are mostly Python holding the GIL. The PCMCache lives on disk,
+    so every worker shares decoded tracks. Each worker keeps one LyricEngine and
+    one VideoEngine per distinct render profile. Segmented encodes get
+    cpu_count // jobs cores each so parallel jobs do not oversubscribe the machine.
+    """
+    def __init__(self, output_dir="outputs", jobs=1, pcm_cache_dir="pcm_cache", runs_dir=DEFAULT_RUNS_ROOT):
+        from modules.pcm_cache import PCMCache
+
+        self.options = {
+            "output_dir": output_dir, "jobs": jobs, "pcm_cache_dir": pcm_cache_dir, "runs_dir": runs_dir,
+        }
+        self.output_dir = output_dir
+        self.runs_dir = runs_dir
+        self.jobs = max(1, jobs)
+        self.cores_per_job = max(1, (os.cpu_count() or 1) // self.jobs)
+        self.lyric_engine = LyricEngine()
+        self.pcm_cache = PCMCache(cache_dir=pcm_cache_dir)
+        self._video_engines = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _video_engine(self, render):
+        from modules.video_engine import VideoEngine
+
+        options = {k: v for k, v in render.items() if k not in ("fps", "bg_image")}
+        if options.get("backend", "concat") == "concat":
+            options.setdefault("cpu_count", self.cores_per_job)
+        key = json.dumps(options, sort_keys=True)
+        if key not in self._video_engines:
+            self._video_engines[key] = VideoEngine(**options)
+        return self._video_engines[key]
+
+    def render_manifest(self, manifest_path):
+        from modules.checkpoint import content_digest
+        from modules.pipeline import job_fingerprint, run_mix_pipeline
+
+        manifest = load_manifest(manifest_path)
+        base_dir = os.path.dirname(os.path.abspath(manifest_path))
+        name = manifest_name(manifest, manifest_path)
+        render = dict(manifest.get("render", {}))
+        bg_image = render.get("bg_image")
+        if bg_image and not os.path.isabs(bg_image):
+            bg_image = os.path.join(base_dir, bg_image)
+
+        tracks = manifest_tracks(manifest, base_dir, self.lyric_engine)
+        mix_output = os.path.join(self.output_dir, f"{name}.mp3")
+        video_output = os.path.join(self.output_dir, f"{name}.mp4")
+
+        video_engine = self._video_engine(render)
+        fps = int(render.get("fps", 30))
+        crossfade_sec = float(manifest.get("crossfade_sec", 4.0))
+        timeline_options = manifest.get("timeline")
+
+        # Kept when the job fails, so rerunning the same manifest resumes from the last finished stage
+        run_id = job_fingerprint(
+            tracks, crossfade_sec, video_engine, timeline_options, fps, extra=content_digest(bg_image)
+        )[:12]
+        with RunWorkspace(root=self.runs_dir, name=f"{name}_{run_id}", keep_on_failure=True) as workspace:
+            return run_mix_pipeline(
+                tracks,
+                mix_output,
+                video_output,
+                crossfade_sec=crossfade_sec,
+                video_engine=video_engine,
+                lyric_engine=self.lyric_engine,
+                pcm_cache=self.pcm_cache,
+                timeline_options=timeline_options,
+                bg_image_path=bg_image,
+                fps=fps,
+                work_dir=workspace.subdir("frames"),
+                checkpoint_dir=workspace.path,
+                progress=lambda percent, message: print(f"[{name}] {percent:3d}% {message}"),
+            )
+
+    def run(self, manifest_paths):
+        """
+        Returns {manifest_path: error message or None}.
+        Raises ValueError if two manifests share an output name.
+        """
+        check_unique_names(manifest_paths)
+
+        results = {}
+        with ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_init_worker, initargs=(self.options,)
+        ) as pool:
+            futures = {pool.submit(_render_in_worker, path): path for path in manifest_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    output = future.result()
+                    results[path] = None
+                    print(f"OK   {path} -> {output['video']}")
+                except Exception as e:
+                    results[path] = str(e)
+                    print(f"FAIL {path}: {e}")
+
+        # Failed jobs keep their run directories for resuming; drop the ones nobody came back for
+        prune_stale_runs(self.runs_dir)
+        return results
+
+
+# One BatchRenderer per worker process, so engines stay warm across that worker's jobs
+_WORKER = None
+
+
+def _init_worker(options):
+    global _WORKER
+    _WORKER = BatchRenderer(**options)
+
+
+def _render_in_worker(manifest_path):
+    return _WORKER.render_manifest(manifest_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render mixset lyric videos from manifest files.")
+    parser.add_argument("manifests", nargs="+", help="Manifest files or directories of manifests")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of manifests rendered concurrently")
+    parser.add_argument("-o", "--output-dir", default="outputs", help="Where mixes and videos are written")
+    parser.add_argument("--pcm-cache-dir", default="pcm_cache", help="Decoded audio cache shared by all jobs")
+    parser.add_argument("--runs-dir", default=DEFAULT_RUNS_ROOT, help="Checkpoints of unfinished jobs, used to resume them")
+    args = parser.parse_args(argv)
+
+    manifest_paths = collect_manifests(args.manifests)
+    if not manifest_paths:
+        print("No manifests found.")
+        return 1
+
+    started = time.perf_counter()
+    try:
+        results = BatchRenderer(
+            output_dir=args.output_dir, jobs=args.jobs, pcm_cache_dir=args.pcm_cache_dir, runs_dir=args.runs_dir
+        ).run(manifest_paths)
+    except ValueError as e:
+        print(e)
+        return 1
+    failed = [path for path, error in results.items() if error]
+    elapsed = time.perf_counter() - started
+    print(f"{len(results) - len(failed)}/{len(results)} manifests rendered in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
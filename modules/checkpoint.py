@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import time
+
+
+def fingerprint(*parts):
+    """
+    Stable hash of JSON-serialisable inputs.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path):
+    """
+    Cheap identity for large source files: path, size and mtime.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{os.path.abspath(path)}|missing"
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def content_digest(path):
+    """
+    Content hash for small inputs (background images) whose copies get fresh mtimes.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class RunManifest:
+    """
+    run.json in a run directory, recording finished pipeline stages:
+
+        {"stages": {"mix": {"inputs": "<fingerprint>", "outputs": {...}, "files": [...], "finished_at": ...}}}
+
+    A stage is reused only if its input fingerprint matches and all of its
+    recorded files still exist. Writes are atomic, so a crash never leaves a
+    half-written manifest behind.
+    """
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, "run.json")
+        self.data = {"stages": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable run manifest {self.path}: {e}")
+
+    def get(self, stage, inputs):
+        """
+        Returns the recorded outputs of a completed stage, or None if it has to run.
+        """
+        entry = self.data["stages"].get(stage)
+        if not entry or entry.get("inputs") != inputs:
+            return None
+        if not all(os.path.exists(path) for path in entry.get("files", [])):
+            return None
+        return entry["outputs"]
+
+    def complete(self, stage, inputs, outputs, files=()):
+        self.data["stages"][stage] = {
+            "inputs": inputs,
+            "outputs": outputs,
+            "files": list(files),
+            "finished_at": time.time(),
+        }
+        self.save()
+
+    def save(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
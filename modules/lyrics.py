@@ -1,6 +1,18 @@
+import heapq
+import os
 import re
 
+# Accepted values of LyricEngine.compact_timeline options
+TIMELINE_CHOICES = {
+    "priority": ("outgoing", "incoming"),
+    "short_policy": ("merge", "drop"),
+    "gap_fill": ("blank", "title"),
+}
+
 class LyricEngine:
+    # Enhanced LRC word timestamp <mm:ss.xx>
+    word_pattern = re.compile(r'<(\d+):(\d+)(\.\d+)?>')
+
     def __init__(self):
         pass
 
@@ -9,10 +21,35 @@ class LyricEngine:
             return False
         return bool(re.search(r'\[\d+:\d+(\.\d+)?\]', lrc_text))
 
+    def _to_ms(self, minutes, seconds, fraction):
+        fraction = float(fraction) if fraction else 0.0
+        return (int(minutes) * 60 * 1000) + (int(seconds) * 1000) + int(fraction * 1000)
+
+    def _parse_words(self, line_ms, body):
+        """
+        Splits an enhanced LRC body ("<mm:ss.xx>word <mm:ss.xx>word<mm:ss.xx>")
+        into [{'time_ms': ..., 'text': ...}, ...]. A trailing tag with no text is
+        kept as an end marker for the last word. Returns None without word tags.
+        """
+        parts = self.word_pattern.split(body)
+        if len(parts) == 1:
+            return None
+
+        words = []
+        if parts[0].strip():
+            words.append({"time_ms": line_ms, "text": parts[0]})
+        for i in range(1, len(parts), 4):
+            time_ms = self._to_ms(parts[i], parts[i + 1], parts[i + 2])
+            words.append({"time_ms": time_ms, "text": parts[i + 3]})
+        return words
+
     def parse_lrc(self, lrc_text):
         """
         Parses a standard LRC string into a list of dicts:
         [{'time_ms': 12000, 'text': 'Hello world'}, ...]
+
+        Enhanced LRC word timings (<mm:ss.xx>) are returned as an extra
+        'words' list: [{'time_ms': 12000, 'text': 'Hello '}, ...]
         """
         lines = lrc_text.splitlines()
         parsed = []
@@ -22,16 +59,22 @@ class LyricEngine:
         for line in lines:
             match = pattern.match(line)
             if match:
-                minutes = int(match.group(1))
-                seconds = int(match.group(2))
-                fraction = float(match.group(3)) if match.group(3) else 0.0
-                text = match.group(4).strip()
-                
-                total_ms = (minutes * 60 * 1000) + (seconds * 1000) + int(fraction * 1000)
-                parsed.append({"time_ms": total_ms, "text": text})
+                total_ms = self._to_ms(match.group(1), match.group(2), match.group(3))
+                entry = {"time_ms": total_ms, "text": match.group(4).strip()}
+
+                words = self._parse_words(total_ms, match.group(4))
+                if words:
+                    entry["text"] = "".join(w["text"] for w in words).strip()
+                    entry["words"] = words
+                parsed.append(entry)
         
         return sorted(parsed, key=lambda x: x["time_ms"])
 
+    def has_word_timing(self, lrc_text):
+        if not lrc_text:
+            return False
+        return bool(self.word_pattern.search(lrc_text))
+
     def parse_plain_lines(self, text):
         lines = []
         for line in text.splitlines():
@@ -62,7 +105,7 @@ class LyricEngine:
             mix_log (list): The metadata returned by AudioMixer.
             
         Returns:
-            final_lyrics (list): List of {'start_ms': ..., 'text': ..., 'text_trans': ...}
+            final_lyrics (list): List of {'time_ms': ..., 'text': ..., 'track_index': ...}
         """
         final_timeline = []
         
@@ -90,13 +133,15 @@ class LyricEngine:
             mix_start = log_entry["mix_start_ms"]
             speed = log_entry["speed_rate"]
 
+            track_index = log_entry.get("track_index", idx)
+
             if mode == "plain" or not parsed_original:
                 plain_lines = self.parse_plain_lines(lrc_content)
-                final_timeline.extend(
-                    self._auto_distribute_lines(
-                        plain_lines, source_start, source_end, mix_start, speed
-                    )
-                )
+                for entry in self._auto_distribute_lines(
+                    plain_lines, source_start, source_end, mix_start, speed
+                ):
+                    entry["track_index"] = track_index
+                    final_timeline.append(entry)
             else:
                 for line in parsed_original:
                     t_old = line["time_ms"]
@@ -104,19 +149,195 @@ class LyricEngine:
                     # Check if this line falls within the selected segment
                     if source_start <= t_old <= source_end:
                         t_new = (t_old - source_start) / speed + mix_start
-                        final_timeline.append({
+                        entry = {
                             "time_ms": t_new,
-                            "text": line["text"]
-                        })
+                            "text": line["text"],
+                            "track_index": track_index
+                        }
+                        if "words" in line:
+                            entry["words"] = [
+                                {"time_ms": (w["time_ms"] - source_start) / speed + mix_start, "text": w["text"]}
+                                for w in line["words"]
+                            ]
+                        final_timeline.append(entry)
         
         # Sort by final timeline
         return sorted(final_timeline, key=lambda x: x["time_ms"])
 
+    def _track_title(self, track_index, titles, mix_log):
+        if titles and 0 <= track_index < len(titles) and titles[track_index]:
+            return titles[track_index]
+        for entry in mix_log:
+            if entry.get("track_index") == track_index:
+                return os.path.splitext(os.path.basename(entry.get("path", "")))[0]
+        return ""
+
+    def _active_track(self, track_ranges, t):
+        """
+        Track playing at t; during a crossfade the incoming (later) one.
+        """
+        active = [idx for idx, (start, end) in track_ranges.items() if start <= t < end]
+        if active:
+            return max(active)
+        started = [idx for idx, (start, _) in track_ranges.items() if start <= t]
+        return max(started) if started else 0
+
+    def _merge_lines(self, first, second):
+        merged = dict(first)
+        merged["text"] = f"{first['text']}\n{second['text']}"
+        if first.get("words") and second.get("words"):
+            merged["words"] = first["words"] + [{"time_ms": second["words"][0]["time_ms"], "text": "\n"}] + second["words"]
+        else:
+            merged.pop("words", None)
+        return merged
+
+    def compact_timeline(self, timeline, mix_log, priority="outgoing", min_duration_ms=800,
+                         short_policy="merge", max_line_ms=8000, gap_ms=6000, gap_fill="blank",
+                         titles=None):
+        """
+        Turns the interleaved output of process_mix_lyrics into one well-formed
+        frame sequence starting at 0 ms.
+
+        Every line is shown from its time until the next line of the same track,
+        the end of its track, or max_line_ms (extended to the last word time for
+        word-timed lines). Where lines of crossfading tracks
+        overlap, a sweep over the sorted intervals keeps one winner:
+        priority="outgoing" prefers the earlier track, "incoming" the later one.
+
+        Args:
+            min_duration_ms: Lines visible for less than this are merged into the
+                next line's frame, which then starts at the short line's time
+                (short_policy="merge"), or dropped ("drop"). A short line with no
+                following line is kept as is.
+            gap_ms: Stretches without lyrics longer than this get an explicit frame,
+                empty (gap_fill="blank") or the track title ("title"); shorter
+                gaps keep the previous frame on screen.
+            titles (list): Optional track titles by track_index for title frames.
+
+        Returns:
+            list: [{'time_ms': ..., 'text': ..., 'track_index': ...}, ...]; filler
+            frames carry 'gap': True.
+
+        Raises:
+            ValueError: For unknown priority / short_policy / gap_fill values or
+                negative durations.
+        """
+        for option, value in (("priority", priority), ("short_policy", short_policy), ("gap_fill", gap_fill)):
+            if value not in TIMELINE_CHOICES[option]:
+                raise ValueError(f"Unknown {option}: {value} (choose from {', '.join(TIMELINE_CHOICES[option])})")
+        for option, value in (("min_duration_ms", min_duration_ms), ("max_line_ms", max_line_ms), ("gap_ms", gap_ms)):
+            if value < 0:
+                raise ValueError(f"{option} must not be negative: {value}")
+
+        track_ranges = {e["track_index"]: (e["mix_start_ms"], e["mix_end_ms"]) for e in mix_log}
+
+        # 1) One display interval per line
+        by_track = {}
+        for item in sorted(timeline, key=lambda x: x["time_ms"]):
+            by_track.setdefault(item.get("track_index", 0), []).append(item)
+
+        intervals = [] # (start, end, track_index, seq, item)
+        for track, items in by_track.items():
+            track_end = track_ranges.get(track, (None, None))[1]
+            for i, item in enumerate(items):
+                end = item["time_ms"] + max_line_ms
+                if item.get("words"):
+                    # Keep word-timed lines up until their last word / end marker
+                    end = max(end, item["words"][-1]["time_ms"])
+                if i + 1 < len(items):
+                    end = min(end, items[i + 1]["time_ms"])
+                if track_end is not None:
+                    end = min(end, track_end)
+                if end > item["time_ms"]:
+                    intervals.append((item["time_ms"], end, track, len(intervals), item))
+        intervals.sort()
+
+        mix_end = max([end for _, end in track_ranges.values()] + [iv[1] for iv in intervals] + [0])
+        if mix_end <= 0:
+            return []
+
+        points = {0, mix_end}
+        points.update(start for start, _ in track_ranges.values() if 0 < start < mix_end)
+        for start, end, _, _, _ in intervals:
+            points.add(start)
+            points.add(end)
+        boundaries = sorted(p for p in points if 0 <= p <= mix_end)
+
+        # 2) Sweep: the heap holds active intervals ordered by track priority
+        sign = 1 if priority == "outgoing" else -1
+        heap = []
+        pos = 0
+        segments = [] # [start, end, item or None, track_index]
+        for t, t_next in zip(boundaries, boundaries[1:]):
+            while pos < len(intervals) and intervals[pos][0] <= t:
+                iv = intervals[pos]
+                heapq.heappush(heap, (sign * iv[2], iv[0], iv[3], iv))
+                pos += 1
+            while heap and heap[0][3][1] <= t:
+                heapq.heappop(heap)
+
+            if heap:
+                iv = heap[0][3]
+                item, track = iv[4], iv[2]
+            else:
+                item, track = None, self._active_track(track_ranges, t)
+
+            last = segments[-1] if segments else None
+            if last and last[2] is item and last[3] == track:
+                last[1] = t_next
+            else:
+                segments.append([t, t_next, item, track])
+
+        # 3) Short lines are merged forward; short gaps keep the previous frame on screen.
+        # A merged frame starts at the short line's own time, never earlier.
+        compacted = []
+        pending = None # short line waiting for the next line
+        for start, end, item, track in segments:
+            if pending is not None:
+                if item is not None:
+                    start, item, track = pending[0], self._merge_lines(pending[2], item), pending[3]
+                else:
+                    compacted.append(pending)
+                pending = None
+
+            prev = compacted[-1] if compacted else None
+            if prev and item is not None and prev[2] is item:
+                prev[1] = end
+                continue
+            if item is not None and end - start < min_duration_ms:
+                if short_policy == "merge":
+                    pending = [start, end, item, track]
+                    continue
+                if prev:
+                    prev[1] = end
+                    continue
+            if prev and item is None and end - start < gap_ms:
+                prev[1] = end
+                continue
+            compacted.append([start, end, item, track])
+        if pending is not None:
+            compacted.append(pending)
+
+        # 4) Emit frames
+        frames = []
+        for start, _, item, track in compacted:
+            if item is None:
+                text = self._track_title(track, titles, mix_log) if gap_fill == "title" else ""
+                frames.append({"time_ms": start, "text": text, "track_index": track, "gap": True})
+            else:
+                entry = dict(item)
+                entry["time_ms"] = start
+                frames.append(entry)
+        return frames
+
     def translate_lines(self, lyric_list):
         """
         Mock translation. Replace with OpenAI call in production.
         """
         for item in lyric_list:
+            if item.get("gap") or not item["text"]:
+                item["text_trans"] = ""
+                continue
             # TODO: Integrate real translation API here.
             item["text_trans"] = f"(Trans) {item['text']}" 
         return lyric_list
@@ -1,8 +1,18 @@
+import io
+import wave
+
+import numpy as np
 from moviepy import AudioFileClip, CompositeAudioClip
+from moviepy.audio.AudioClip import AudioArrayClip
+
+PREVIEW_FPS = 44100
+
 
 class AudioMixer:
-    def __init__(self):
+    def __init__(self, pcm_cache=None):
         self.tracks = [] # List of dicts: {path, start, end}
+        # Optional PCMCache: sources are sliced from memory-mapped decoded audio instead of re-decoded
+        self.pcm_cache = pcm_cache
 
     def add_track(self, file_path, start_time_sec, end_time_sec):
         """
@@ -31,7 +41,11 @@ class AudioMixer:
         for i, conf in enumerate(self.tracks):
             # Load and cut
             try:
-                clip = AudioFileClip(conf["path"]).subclip(conf["start"], conf["end"])
+                if self.pcm_cache is not None:
+                    samples = self.pcm_cache.slice(conf["path"], conf["start"], conf["end"])
+                    clip = AudioArrayClip(samples, fps=self.pcm_cache.sample_rate)
+                else:
+                    clip = AudioFileClip(conf["path"]).subclip(conf["start"], conf["end"])
             except Exception as e:
                 print(f"Error loading clip {conf['path']}: {e}")
                 continue
@@ -77,3 +91,74 @@ class AudioMixer:
 
     def export(self, audio_clip, path):
         audio_clip.write_audiofile(path, fps=44100)
+
+    def _decode_window(self, path, start, end, fps):
+        if self.pcm_cache is not None and fps == self.pcm_cache.sample_rate:
+            return self.pcm_cache.slice(path, start, end)
+
+        # No usable PCMCache: decode just the window
+        clip = AudioFileClip(path)
+        try:
+            samples = clip.subclip(start, end).to_soundarray(fps=fps)
+        finally:
+            clip.close()
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        return samples
+
+    def preview_transition(self, index, crossfade_sec=5.0, context_sec=2.0, fps=PREVIEW_FPS):
+        """
+        Renders only the crossfade between track `index` and `index + 1`, plus
+        context_sec of each side, with the same fades as process_mix.
+
+        Returns:
+            bytes: 16-bit PCM WAV, ready for st.audio(..., format="audio/wav").
+        """
+        if index < 0 or index + 1 >= len(self.tracks):
+            raise IndexError(f"No transition after track {index}")
+
+        out_conf = self.tracks[index]
+        in_conf = self.tracks[index + 1]
+        crossfade = min(crossfade_sec, out_conf["end"] - out_conf["start"], in_conf["end"] - in_conf["start"])
+        crossfade = max(crossfade, 0.0)
+
+        tail_start = max(out_conf["start"], out_conf["end"] - crossfade - context_sec)
+        head_end = min(in_conf["end"], in_conf["start"] + crossfade + context_sec)
+        tail = self._decode_window(out_conf["path"], tail_start, out_conf["end"], fps).copy()
+        head = self._decode_window(in_conf["path"], in_conf["start"], head_end, fps).copy()
+
+        channels = max(tail.shape[1], head.shape[1])
+        if tail.shape[1] < channels:
+            tail = np.repeat(tail, channels, axis=1)
+        if head.shape[1] < channels:
+            head = np.repeat(head, channels, axis=1)
+
+        # Linear fades, like audio_fadeout/audio_fadein in process_mix
+        fade = min(int(crossfade * fps), len(tail), len(head))
+        if fade > 0:
+            tail[-fade:] *= np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+            head[:fade] *= np.linspace(0.0, 1.0, fade, dtype=np.float32)[:, None]
+
+        offset = len(tail) - fade
+        mixed = np.zeros((max(len(tail), offset + len(head)), channels), dtype=np.float32)
+        mixed[:len(tail)] += tail
+        mixed[offset:offset + len(head)] += head
+
+        pcm = (np.clip(mixed, -1.0, 1.0) * 32767).astype("<i2")
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(fps)
+            wav.writeframes(pcm.tobytes())
+        return buf.getvalue()
+
+    def preview_transitions(self, crossfade_sec=5.0, context_sec=2.0, fps=PREVIEW_FPS):
+        """
+        One preview WAV per transition, in mix order.
+        """
+        return [
+            self.preview_transition(i, crossfade_sec, context_sec, fps)
+            for i in range(len(self.tracks) - 1)
+        ]
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import subprocess
+import threading
+import uuid
+
+import numpy as np
+
+
+class PCMCache:
+    """
+    Decodes each source track once to raw interleaved float32 PCM on disk and
+    hands out numpy.memmap views, so slicing [start:end] is zero-copy and only
+    the touched pages are read.
+
+    Entries are keyed by path, size and mtime, so an edited file is decoded again.
+    The directory is capped at max_bytes with least-recently-used eviction
+    (access time is tracked through the file mtime), which makes it safe to
+    share between processes on one volume.
+    """
+    def __init__(self, cache_dir="pcm_cache", max_bytes=20 * 1024 ** 3, sample_rate=44100,
+                 channels=2, ffmpeg_path="ffmpeg"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.ffmpeg_path = ffmpeg_path
+        self._lock = threading.Lock()
+        self._decode_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, path):
+        st = os.stat(path)
+        ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{self.sample_rate}|{self.channels}"
+        digest = hashlib.sha1(ident.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.f32")
+
+    def _decode(self, path, entry_path):
+        tmp_path = f"{entry_path}.{uuid.uuid4().hex[:8]}.tmp"
+        cmd = [
+            self.ffmpeg_path, "-y", "-loglevel", "error",
+            "-i", path,
+            "-vn",
+            "-f", "f32le", "-acodec", "pcm_f32le",
+            "-ac", str(self.channels),
+            "-ar", str(self.sample_rate),
+            tmp_path
+        ]
+        result = subprocess.run(cmd)
+        if result.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise Exception(f"FFmpeg failed to decode audio: {path}")
+        # Atomic publish, so readers never see a half-written entry
+        os.replace(tmp_path, entry_path)
+
+    def _open(self, entry_path):
+        # Raises FileNotFoundError if the entry was never decoded or another process evicted it.
+        # The mapping stays valid after the file is closed or removed.
+        with open(entry_path, "rb") as f:
+            frames = os.fstat(f.fileno()).st_size // (4 * self.channels)
+            if frames == 0:
+                return np.zeros((0, self.channels), dtype=np.float32)
+            return np.memmap(f, dtype=np.float32, mode="r", shape=(frames, self.channels))
+
+    def get(self, path):
+        """
+        Returns a read-only (frames, channels) float32 memmap of the whole track.
+        """
+        entry_path = self._entry_path(path)
+        try:
+            samples = self._open(entry_path)
+        except FileNotFoundError:
+            with self._lock:
+                decode_lock = self._decode_locks.setdefault(entry_path, threading.Lock())
+            with decode_lock:
+                try:
+                    return self._open(entry_path)
+                except FileNotFoundError:
+                    self._decode(path, entry_path)
+                    samples = self._open(entry_path)
+                    self.evict(keep=entry_path)
+                    return samples
+
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return samples
+
+    def slice(self, path, start_sec, end_sec):
+        """
+        Zero-copy view of [start_sec, end_sec) of the track.
+        """
+        samples = self.get(path)
+        start = max(0, int(round(start_sec * self.sample_rate)))
+        end = min(len(samples), int(round(end_sec * self.sample_rate)))
+        return samples[start:max(start, end)]
+
+    def duration(self, path):
+        return len(self.get(path)) / float(self.sample_rate)
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used entries until the cache fits max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".f32"):
+                continue
+            entry_path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry_path == keep:
+                continue
+            try:
+                os.remove(entry_path)
+                total -= size
+            except OSError as e:
+                # Still mapped by another process on platforms that forbid it
+                print(f"PCM cache eviction error {entry_path}: {e}")
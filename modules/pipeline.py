@@ -0,0 +1,142 @@
+import os
+
+from modules.checkpoint import RunManifest, content_digest, file_fingerprint, fingerprint
+from modules.lyrics import LyricEngine
+from modules.mixer import AudioMixer
+
+
+class PipelineError(Exception):
+    pass
+
+
+def _part_path(path):
+    # Keeps the extension, which moviepy and ffmpeg use to pick the format
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{ext}"
+
+
+def _timeline_options(tracks, timeline_options):
+    options = {"gap_fill": "title", "titles": [item.get("title", "") for item in tracks]}
+    options.update(timeline_options or {})
+    return options
+
+
+def job_fingerprint(tracks, crossfade_sec, video_engine, timeline_options=None, fps=30, extra=None):
+    """
+    Identifies a pipeline job by everything that affects its outputs; used to
+    name resumable run directories.
+    """
+    return fingerprint(
+        [(file_fingerprint(t["audio_path"]), t["start"], t["end"], t.get("lyrics_raw", ""), t.get("lyrics_mode"))
+         for t in tracks],
+        crossfade_sec,
+        _timeline_options(tracks, timeline_options),
+        video_engine.profile(),
+        fps,
+        extra,
+    )
+
+
+def run_mix_pipeline(tracks, mix_output, video_output, crossfade_sec=4.0, video_engine=None,
+                     lyric_engine=None, pcm_cache=None, timeline_options=None, bg_image_path=None,
+                     fps=30, work_dir=None, checkpoint_dir=None, progress=None):
+    """
+    Mix audio -> process lyrics -> render video. Shared by app.py and cli.py.
+    The mix and video are written under a temporary name and renamed when
+    complete, so readers never see a half-written file.
+
+    Args:
+        tracks (list): Queue items {audio_path, start, end, lyrics_raw, lyrics_mode}.
+        video_engine / lyric_engine: Reused across runs when given (batch mode).
+        pcm_cache (PCMCache): Optional decoded-audio cache for the mixer.
+        timeline_options (dict): Keyword overrides for LyricEngine.compact_timeline.
+        checkpoint_dir (str): Run directory for a RunManifest. Finished stages whose
+            input fingerprints are unchanged are skipped, so a rerun after a crash
+            resumes from the last completed stage. Pair it with a work_dir inside
+            the same directory to also reuse rendered frames and encoded chunks.
+        progress (callable): Optional progress(percent, message) callback.
+
+    Returns:
+        dict: {'audio': mix_output, 'video': video_output, 'mix_log': [...], 'lyrics': [...]}
+    """
+    if video_engine is None:
+        from modules.video_engine import VideoEngine
+        video_engine = VideoEngine()
+    lyric_engine = lyric_engine or LyricEngine()
+    manifest = RunManifest(checkpoint_dir) if checkpoint_dir else None
+
+    def report(percent, message):
+        if progress:
+            progress(percent, message)
+
+    def restore(stage, inputs):
+        # None means "not done"; a finished stage may have empty outputs
+        return manifest.get(stage, inputs) if manifest else None
+
+    def checkpoint(stage, inputs, outputs, files=()):
+        if manifest:
+            manifest.complete(stage, inputs, outputs, files)
+
+    lrc_payloads = [
+        {"text": item.get("lyrics_raw", ""), "mode": item.get("lyrics_mode", "plain")} for item in tracks
+    ]
+
+    # 1) Mix audio
+    report(10, "Step 1/3: 오디오 믹싱 중...")
+    mix_inputs = fingerprint(
+        "mix",
+        [(file_fingerprint(t["audio_path"]), t["start"], t["end"]) for t in tracks],
+        crossfade_sec,
+        os.path.abspath(mix_output),
+    )
+    restored = restore("mix", mix_inputs)
+    if restored is not None:
+        mix_log = restored["mix_log"]
+    else:
+        mixer = AudioMixer(pcm_cache=pcm_cache)
+        for item in tracks:
+            mixer.add_track(item["audio_path"], item["start"], item["end"])
+
+        mixed_audio, mix_log = mixer.process_mix(crossfade_sec=crossfade_sec)
+        if not mixed_audio:
+            raise PipelineError("믹싱에 실패했습니다. 선택한 구간/오디오 파일을 확인해주세요.")
+
+        try:
+            mixer.export(mixed_audio, _part_path(mix_output))
+            os.replace(_part_path(mix_output), mix_output)
+        finally:
+            try:
+                mixed_audio.close()
+            except Exception:
+                pass
+        checkpoint("mix", mix_inputs, {"mix_log": mix_log}, files=[mix_output])
+
+    # 2) Process lyrics
+    report(45, "Step 2/3: 가사 타이밍 처리 중...")
+    options = _timeline_options(tracks, timeline_options)
+    lyrics_inputs = fingerprint("lyrics", mix_inputs, lrc_payloads, options)
+    restored = restore("lyrics", lyrics_inputs)
+    if restored is not None:
+        translated_lyrics = restored["lyrics"]
+    else:
+        processed_lyrics = lyric_engine.process_mix_lyrics(lrc_payloads, mix_log)
+        processed_lyrics = lyric_engine.compact_timeline(processed_lyrics, mix_log, **options)
+        translated_lyrics = lyric_engine.translate_lines(processed_lyrics)
+        checkpoint("lyrics", lyrics_inputs, {"lyrics": translated_lyrics})
+
+    # 3) Render video
+    report(70, "Step 3/3: 영상 렌더링 중...")
+    video_inputs = fingerprint(
+        "video", lyrics_inputs, video_engine.profile(), content_digest(bg_image_path), fps,
+        os.path.abspath(video_output),
+    )
+    if restore("video", video_inputs) is None:
+        video_engine.create_video(
+            mix_output, translated_lyrics, _part_path(video_output),
+            bg_image_path=bg_image_path, fps=fps, work_dir=work_dir,
+        )
+        os.replace(_part_path(video_output), video_output)
+        checkpoint("video", video_inputs, {}, files=[video_output])
+    report(100, "완료!")
+
+    return {"audio": mix_output, "video": video_output, "mix_log": mix_log, "lyrics": translated_lyrics}
@@ -0,0 +1,386 @@
+import hashlib
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Every backend implements the same contract:
+#
+#     render(engine, audio_path, timeline, output_path, work_dir, fps, bg_image) -> output_path
+#
+# timeline is VideoEngine._quantize_timeline() output: [(lyric_item, frame_count), ...]
+# bg_image is a Pillow image already resized to engine.size, or None.
+# A failed ffmpeg run raises an Exception.
+
+
+def write_concat_list(entries, list_path):
+    """
+    entries: [(frame_path, duration_sec), ...]
+    """
+    lines = []
+    for frame_path, duration_sec in entries:
+        # Windows path handling for FFmpeg concat: forward slashes work best
+        safe_path = os.path.abspath(frame_path).replace('\\', '/')
+        lines.append(f"file '{safe_path}'")
+        lines.append(f"duration {duration_sec:.3f}")
+    # Repeat last file so the concat demuxer honours its duration
+    if lines:
+        lines.append(lines[-2])
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def run_ffmpeg(cmd, error_message):
+    print(f"Running FFmpeg: {' '.join(cmd)}")
+    result = subprocess.run(cmd)
+    if result.returncode != 0:
+        raise Exception(error_message)
+
+
+class ConcatBackend:
+    """
+    Writes one PNG per lyric frame and feeds them to ffmpeg through the concat demuxer.
+
+    With segment_sec set, the timeline is split into chunks of about that length
+    which are encoded in parallel (up to `workers` ffmpeg processes) and stitched.
+    cpu_count is the number of cores this render may use (default: all of them);
+    lower it when several renders run side by side.
+    """
+    name = "concat"
+
+    def __init__(self, segment_sec=None, workers=None, cpu_count=None):
+        self.segment_sec = segment_sec
+        self.workers = workers
+        self.cpu_count = cpu_count
+
+    def _write_frames(self, engine, timeline, work_dir, fps, bg_image):
+        """
+        Frames are named by a hash of their content, so repeated lines (choruses)
+        are drawn once and frames left in work_dir by an interrupted run are reused.
+        """
+        bg_key = hashlib.sha1(bg_image.tobytes()).hexdigest() if bg_image is not None else ""
+        entries = []
+        for item, frame_count in timeline:
+            text = item['text']
+            sub_text = item.get('text_trans', '')
+            key = hashlib.sha1(f"{text}\0{sub_text}\0{bg_key}\0{engine.size}".encode("utf-8")).hexdigest()
+            frame_path = os.path.join(work_dir, f"frame_{key[:16]}.png")
+            if not os.path.exists(frame_path):
+                part_path = os.path.join(work_dir, f"frame_{key[:16]}.part.png")
+                engine._create_text_image(text, sub_text, part_path, bg_image)
+                os.replace(part_path, frame_path)
+            entries.append((frame_path, frame_count / fps))
+        return entries
+
+    def render(self, engine, audio_path, timeline, output_path, work_dir, fps, bg_image=None):
+        entries = self._write_frames(engine, timeline, work_dir, fps, bg_image)
+        if self.segment_sec:
+            return self._render_segmented(engine, audio_path, timeline, entries, output_path, work_dir, fps)
+
+        concat_list_path = os.path.join(work_dir, "concat_list.txt")
+        write_concat_list(entries, concat_list_path)
+
+        cmd = [
+            engine.ffmpeg_path, "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", concat_list_path,
+            "-i", audio_path,
+            "-pix_fmt", "yuv420p",
+            "-c:v", "libx264",
+            "-c:a", "aac",
+            "-shortest",
+            output_path
+        ]
+        run_ffmpeg(cmd, "FFmpeg failed to render video.")
+        return output_path
+
+    def _split_chunks(self, timeline, entries, fps):
+        """
+        Groups frames into chunks of roughly segment_sec seconds.
+        Chunks are only cut between lyric frames.
+        """
+        target_frames = max(1, int(self.segment_sec * fps))
+        chunks = []
+        current = []
+        current_frames = 0
+        for (_, frame_count), entry in zip(timeline, entries):
+            current.append(entry)
+            current_frames += frame_count
+            if current_frames >= target_frames:
+                chunks.append((current, current_frames))
+                current = []
+                current_frames = 0
+        if current:
+            chunks.append((current, current_frames))
+        return chunks
+
+    def _encode_chunk(self, engine, list_path, frame_count, fps, output_path, threads):
+        if os.path.exists(output_path):
+            return output_path # finished by an earlier, interrupted run
+        part_path = output_path[:-len(".mp4")] + ".part.mp4"
+        # Identical encoder settings for every chunk so they can be stream-copied together.
+        # Each chunk starts with its own IDR frame, which keeps the stitch points clean.
+        cmd = [
+            engine.ffmpeg_path, "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0",
+            "-i", list_path,
+            "-r", str(fps),
+            "-frames:v", str(frame_count),
+            "-pix_fmt", "yuv420p",
+            "-c:v", "libx264",
+            "-g", str(fps * 10),
+            "-sc_threshold", "0",
+            "-threads", str(threads),
+            "-an",
+            part_path
+        ]
+        result = subprocess.run(cmd)
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg failed to render chunk: {output_path}")
+        os.replace(part_path, output_path)
+        return output_path
+
+    def _render_segmented(self, engine, audio_path, timeline, entries, output_path, work_dir, fps):
+        chunks = self._split_chunks(timeline, entries, fps)
+
+        cores = self.cpu_count or os.cpu_count() or 1
+        workers = self.workers or cores
+        workers = max(1, min(workers, len(chunks)))
+        threads = max(1, cores // workers)
+
+        jobs = []
+        for c, (chunk_entries, chunk_frames) in enumerate(chunks):
+            list_path = os.path.join(work_dir, f"chunk_{c:03d}.txt")
+            write_concat_list(chunk_entries, list_path)
+            # Chunk name covers its frames and timing, so a resumed run only re-encodes changed chunks
+            with open(list_path, "rb") as f:
+                chunk_key = hashlib.sha1(f.read() + f"|{fps}|{chunk_frames}".encode()).hexdigest()[:16]
+            chunk_path = os.path.abspath(os.path.join(work_dir, f"chunk_{c:03d}_{chunk_key}.mp4"))
+            jobs.append((list_path, chunk_frames, chunk_path))
+
+        # ffmpeg does the heavy lifting in child processes, threads are enough to drive them
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(self._encode_chunk, engine, list_path, chunk_frames, fps, chunk_path, threads)
+                for list_path, chunk_frames, chunk_path in jobs
+            ]
+            chunk_paths = [future.result() for future in futures]
+
+        stitch_list_path = os.path.join(work_dir, "chunks.txt")
+        stitch_entries = []
+        for chunk_path in chunk_paths:
+            safe_path = chunk_path.replace('\\', '/')
+            stitch_entries.append(f"file '{safe_path}'")
+        with open(stitch_list_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(stitch_entries))
+
+        cmd = [
+            engine.ffmpeg_path, "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", stitch_list_path,
+            "-i", audio_path,
+            "-map", "0:v", "-map", "1:a",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-shortest",
+            output_path
+        ]
+        run_ffmpeg(cmd, "FFmpeg failed to stitch video chunks.")
+        return output_path
+
+
+class PipeBackend:
+    """
+    Draws each lyric frame once and pipes raw RGB frames into ffmpeg's stdin.
+    Skips the PNG encode/decode round trip and never touches the disk for frames.
+    """
+    name = "pipe"
+
+    def render(self, engine, audio_path, timeline, output_path, work_dir, fps, bg_image=None):
+        width, height = engine.size
+        cmd = [
+            engine.ffmpeg_path, "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{width}x{height}",
+            "-r", str(fps),
+            "-i", "-",
+            "-i", audio_path,
+            "-pix_fmt", "yuv420p",
+            "-c:v", "libx264",
+            "-c:a", "aac",
+            "-shortest",
+            output_path
+        ]
+        print(f"Running FFmpeg: {' '.join(cmd)}")
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        try:
+            for item, frame_count in timeline:
+                frame = engine.render_frame(item['text'], item.get('text_trans', ''), bg_image).tobytes()
+                for _ in range(frame_count):
+                    proc.stdin.write(frame)
+        except BrokenPipeError:
+            pass
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+
+        if returncode != 0:
+            raise Exception("FFmpeg failed to render video.")
+        return output_path
+
+
+def _ass_time(seconds):
+    cs = int(round(seconds * 100))
+    h = cs // 360000
+    m = (cs % 360000) // 6000
+    s = (cs % 6000) // 100
+    return f"{h}:{m:02d}:{s:02d}.{cs % 100:02d}"
+
+
+def _ass_text(text):
+    # ASS has no escape for override braces
+    return (text or "").replace("{", "(").replace("}", ")").replace("\n", "\\N")
+
+
+def _karaoke_text(words, start_ms, end_ms):
+    """
+    Builds ASS karaoke text ({\\kf<cs>}word ...) from absolute word times.
+    Durations come from rounded absolute centiseconds so they never drift.
+    Words starting at or after end_ms (a line cut short) are dropped.
+    """
+    def cs(ms):
+        return int(round(ms / 10.0))
+
+    parts = []
+    line_end = cs(end_ms)
+    cursor = cs(start_ms)
+    for i, word in enumerate(words):
+        if not word["text"]:
+            continue # end marker
+        if cs(word["time_ms"]) >= line_end:
+            break
+        word_start = max(cs(word["time_ms"]), cursor)
+        word_end = cs(words[i + 1]["time_ms"]) if i + 1 < len(words) else line_end
+        word_end = min(max(word_end, word_start), line_end)
+        if word_start > cursor:
+            parts.append(f"{{\\k{word_start - cursor}}}")
+        parts.append(f"{{\\kf{word_end - word_start}}}{_ass_text(word['text'])}")
+        cursor = word_end
+    return "".join(parts)
+
+
+class SubtitleBackend:
+    """
+    Writes the timeline as an ASS subtitle file and lets ffmpeg burn it in over
+    a solid color or the background image. No per-line images are drawn.
+
+    Lines with word timings ('words', from enhanced LRC) get a karaoke sweep
+    via \\kf tags, so cost stays proportional to lines rather than frames.
+    """
+    name = "subtitles"
+
+    font_name = "Malgun Gothic"
+
+    def _write_ass(self, timeline, ass_path, fps, size):
+        width, height = size
+        header = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+            "Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Main,{self.font_name},60,&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,"
+            "0,0,0,0,100,100,0,0,1,2,0,5,192,192,40,1",
+            # Karaoke: SecondaryColour is the unsung text, PrimaryColour the swept highlight
+            f"Style: Karaoke,{self.font_name},60,&H00FFE500,&H00FFFFFF,&H00000000,&H00000000,"
+            "0,0,0,0,100,100,0,0,1,2,0,5,192,192,40,1",
+            f"Style: Sub,{self.font_name},40,&H0000FFFF,&H0000FFFF,&H00000000,&H00000000,"
+            "0,0,0,0,100,100,0,0,1,2,0,2,192,192,400,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        events = []
+        frame_pos = 0
+        for item, frame_count in timeline:
+            start_ms = frame_pos * 1000.0 / fps
+            end_ms = (frame_pos + frame_count) * 1000.0 / fps
+            start = _ass_time(start_ms / 1000.0)
+            end = _ass_time(end_ms / 1000.0)
+            frame_pos += frame_count
+            if item.get('words'):
+                # Word times are absolute; re-anchor them on this line's quantized start
+                offset = start_ms - item.get('time_ms', start_ms)
+                words = [{"time_ms": w["time_ms"] + offset, "text": w["text"]} for w in item['words']]
+                text = _karaoke_text(words, start_ms, end_ms)
+                events.append(f"Dialogue: 0,{start},{end},Karaoke,,0,0,0,,{text}")
+            elif item.get('text'):
+                events.append(f"Dialogue: 0,{start},{end},Main,,0,0,0,,{_ass_text(item['text'])}")
+            if item.get('text_trans'):
+                events.append(f"Dialogue: 0,{start},{end},Sub,,0,0,0,,{_ass_text(item['text_trans'])}")
+        with open(ass_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(header + events) + "\n")
+        return frame_pos
+
+    def render(self, engine, audio_path, timeline, output_path, work_dir, fps, bg_image=None):
+        width, height = engine.size
+        ass_path = os.path.abspath(os.path.join(work_dir, "lyrics.ass"))
+        total_frames = self._write_ass(timeline, ass_path, fps, engine.size)
+
+        if bg_image is not None:
+            bg_path = os.path.join(work_dir, "background.png")
+            bg_image.save(bg_path)
+            video_input = ["-loop", "1", "-framerate", str(fps), "-i", bg_path]
+        else:
+            video_input = ["-f", "lavfi", "-i", f"color=c=0x141414:s={width}x{height}:r={fps}"]
+
+        # Filter arguments need ':' and '\' escaped (Windows drive letters)
+        filter_path = ass_path.replace('\\', '/').replace(':', '\\:')
+        cmd = [
+            engine.ffmpeg_path, "-y",
+            *video_input,
+            "-i", audio_path,
+            "-vf", f"ass='{filter_path}'",
+            "-frames:v", str(total_frames),
+            "-pix_fmt", "yuv420p",
+            "-c:v", "libx264",
+            "-c:a", "aac",
+            "-shortest",
+            output_path
+        ]
+        run_ffmpeg(cmd, "FFmpeg failed to render video.")
+        return output_path
+
+
+BACKENDS = {
+    ConcatBackend.name: ConcatBackend,
+    PipeBackend.name: PipeBackend,
+    SubtitleBackend.name: SubtitleBackend,
+}
+
+
+def get_backend(name, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown video backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
+
+
+def benchmark_backends(audio_path, lyric_data, output_dir, names=None, fps=30):
+    """
+    Renders the same input with each backend and returns {name: seconds}.
+    """
+    from modules.video_engine import VideoEngine
+
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+    for name in names or list(BACKENDS):
+        engine = VideoEngine(backend=name)
+        output_path = os.path.join(output_dir, f"bench_{name}.mp4")
+        started = time.perf_counter()
+        engine.create_video(audio_path, lyric_data, output_path, fps=fps)
+        timings[name] = time.perf_counter() - started
+    return timings
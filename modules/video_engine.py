@@ -1,11 +1,48 @@
 import os
-import subprocess
-import shutil
 from PIL import Image, ImageDraw, ImageFont
 
+from modules.video_backends import get_backend
+from modules.workspace import RunWorkspace
+
+# Tried in order; Malgun Gothic first for Korean support
+FONT_CANDIDATES = ("malgun.ttf", "arial.ttf")
+
+# Backend options that do not affect the rendered output
+SCHEDULING_OPTIONS = ("workers", "cpu_count")
+
+
 class VideoEngine:
-    def __init__(self):
-        pass
+    def __init__(self, backend="concat", ffmpeg_path="ffmpeg", size=(1920, 1080), **backend_options):
+        """
+        backend: "concat" (PNG concat), "pipe" (raw frames piped to ffmpeg)
+                 or "subtitles" (ASS burn-in). Extra keyword arguments are
+                 passed to the backend, e.g. segment_sec/workers for "concat".
+        """
+        self.backend = get_backend(backend, **backend_options)
+        self.ffmpeg_path = ffmpeg_path
+        self.size = size
+        self._font_path = None
+        self._font_resolved = False
+
+    def profile(self):
+        """
+        Settings that affect the rendered output; used to fingerprint render checkpoints.
+        """
+        # Scheduling knobs change how fast a render runs, not what it produces
+        options = {k: v for k, v in vars(self.backend).items() if k not in SCHEDULING_OPTIONS}
+        return {"backend": self.backend.name, "size": list(self.size), "options": options}
+
+    def _resolve_font_path(self):
+        if not self._font_resolved:
+            self._font_resolved = True
+            for candidate in FONT_CANDIDATES:
+                try:
+                    ImageFont.truetype(candidate, 10)
+                except Exception:
+                    continue
+                self._font_path = candidate
+                break
+        return self._font_path
 
     def _measure_text_width(self, draw, text, font):
         bbox = draw.textbbox((0, 0), text, font=font)
@@ -69,28 +106,28 @@ class VideoEngine:
             return 0
         return sum(heights) + line_spacing * (len(heights) - 1)
 
-    def _create_text_image(self, text, sub_text, output_path, size=(1920, 1080)):
+    def _load_background(self, bg_image_path):
+        if not bg_image_path or not os.path.exists(bg_image_path):
+            return None
+        try:
+            return Image.open(bg_image_path).convert('RGB').resize(self.size)
+        except Exception as e:
+            print(f"Background load error {bg_image_path}: {e}")
+            return None
+
+    def render_frame(self, text, sub_text, bg_image=None):
         """
-        Creates an image with text using Pillow.
+        Draws one lyric frame with Pillow and returns the image.
         """
-        img = Image.new('RGB', size, color=(20, 20, 20))
+        size = self.size
+        if bg_image is not None:
+            img = bg_image.copy()
+        else:
+            img = Image.new('RGB', size, color=(20, 20, 20))
         draw = ImageDraw.Draw(img)
-        
-        # Load font - standard windows font or fallback
-        font_path = None
-        try:
-            # Try Arial or Malgun Gothic for Korean support
-            font_path = "malgun.ttf"
-            font_main = ImageFont.truetype(font_path, 60)
-            font_sub = ImageFont.truetype(font_path, 40)
-        except:
-            font_main = ImageFont.load_default()
-            font_sub = ImageFont.load_default()
-            
-        # Draw Main Text (Centered)
-        # Using simple basic calculations for text centering (as textbbox/textwidth availability varies by PIL version)
-        # Assuming simple drawing for MVP
-        
+
+        font_path = self._resolve_font_path()
+
         max_width = int(size[0] * 0.8)
         font_main, lines = self._fit_text(
             draw, text, font_path, 60, max_width, max_lines=4, min_size=28
@@ -116,70 +153,47 @@ class VideoEngine:
             for line in sub_lines:
                 draw.text((size[0]//2, y_cursor), line, font=font_sub, fill="yellow", anchor="mm")
                 y_cursor += self._text_block_height(draw, [line], font_sub, 0) + sub_spacing
-                
-        img.save(output_path)
 
-    def create_video(self, audio_path, lyric_data, output_path, bg_image_path=None):
+        return img
+
+    def _create_text_image(self, text, sub_text, output_path, bg_image=None):
+        """
+        Creates an image with text using Pillow.
+        """
+        self.render_frame(text, sub_text, bg_image).save(output_path)
+
+    def _quantize_timeline(self, lyric_data, fps):
         """
-        Generates a video using FFmpeg concat method.
+        Snaps every lyric start to a video frame boundary.
+
+        Returns a list of (item, frame_count) so durations add up to whole frames
+        and chunks can be cut without drift.
         """
-        # 1. Create temporary directory for frames
-        temp_dir = "temp_frames"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        concat_list_path = os.path.join(temp_dir, "concat_list.txt")
-        audio_duration = 0 # We rely on MP3 duration provided by external or calculate it
-        
-        # We need precise duration for each frame.
-        # lyric_data is [{'time_ms': ..., 'text': ...}, ...]
-        
-        concat_entries = []
-        
+        starts = [int(round(item["time_ms"] / 1000.0 * fps)) for item in lyric_data]
+        timeline = []
         for i, item in enumerate(lyric_data):
-            start_ms = item["time_ms"]
-            
-            # Determine duration
             if i < len(lyric_data) - 1:
-                next_ms = lyric_data[i+1]["time_ms"]
-                duration_sec = (next_ms - start_ms) / 1000.0
+                frame_count = starts[i + 1] - starts[i]
             else:
-                duration_sec = 5.0 # Extend last frame
-                
-            frame_filename = f"frame_{i:04d}.png"
-            frame_path = os.path.join(temp_dir, frame_filename)
-            
-            self._create_text_image(item['text'], item.get('text_trans', ''), frame_path)
-            
-            # Escape path for ffmpeg concat file
-            # Windows path handling for FFmpeg concat: forward slashes work best
-            safe_path = os.path.abspath(frame_path).replace('\\', '/')
-            
-            concat_entries.append(f"file '{safe_path}'")
-            concat_entries.append(f"duration {duration_sec:.3f}")
-            
-        # Write concat file
-        with open(concat_list_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(concat_entries))
-            
-        # 2. Run FFmpeg
-        # ffmpeg -f concat -safe 0 -i list.txt -i audio.mp3 -vf "format=yuv420p" -c:v libx264 -c:a aac -shortest out.mp4
-        
-        cmd = [
-            "ffmpeg", "-y",
-            "-f", "concat", "-safe", "0",
-            "-i", concat_list_path,
-            "-i", audio_path,
-            "-pix_fmt", "yuv420p",
-            "-c:v", "libx264",
-            "-c:a", "aac",
-            "-shortest", 
-            output_path
-        ]
-        
-        print(f"Running FFmpeg: {' '.join(cmd)}")
-        result = subprocess.run(cmd)
-        
-        if result.returncode != 0:
-            raise Exception("FFmpeg failed to render video.")
-            
-        return output_path
+                frame_count = int(round(5.0 * fps)) # Extend last frame
+            if frame_count > 0:
+                timeline.append((item, frame_count))
+        return timeline
+
+    def create_video(self, audio_path, lyric_data, output_path, bg_image_path=None, fps=30, work_dir=None):
+        """
+        Renders lyric_data ([{'time_ms': ..., 'text': ..., 'text_trans': ...}, ...])
+        over audio_path into output_path with the configured backend.
+
+        Intermediate files go to work_dir; without one, a private RunWorkspace
+        is created and removed when rendering finishes.
+        """
+        timeline = self._quantize_timeline(lyric_data, fps)
+        bg_image = self._load_background(bg_image_path)
+
+        if work_dir is None:
+            with RunWorkspace(prefix="frames_") as workspace:
+                return self.backend.render(self, audio_path, timeline, output_path, workspace.path, fps, bg_image)
+
+        os.makedirs(work_dir, exist_ok=True)
+        return self.backend.render(self, audio_path, timeline, output_path, work_dir, fps, bg_image)
@@ -0,0 +1,255 @@
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# tmpfs is only used if it has at least this much free space
+TMPFS_ROOT = "/dev/shm"
+TMPFS_MIN_FREE_BYTES = 1024 * 1024 * 1024
+
+# Resumable (named) runs hold hours of work, so they live on disk rather than tmpfs
+DEFAULT_RUNS_ROOT = "runs"
+
+
+def default_work_root():
+    """
+    Picks the base directory for run workspaces: tmpfs when available, else the system temp dir.
+    """
+    if os.path.isdir(TMPFS_ROOT) and os.access(TMPFS_ROOT, os.W_OK):
+        try:
+            if shutil.disk_usage(TMPFS_ROOT).free >= TMPFS_MIN_FREE_BYTES:
+                return TMPFS_ROOT
+        except OSError:
+            pass
+    return tempfile.gettempdir()
+
+
+class RunLockedError(Exception):
+    """
+    Another process is already working in the same named run directory.
+    """
+
+
+LOCK_FILE = ".lock"
+
+
+def _try_lock(path):
+    """
+    Takes the exclusive lock of a run directory without waiting.
+    Returns the lock's file descriptor, or None if another process holds it.
+    The OS releases the lock if the holder dies, so a crashed run can be resumed.
+    """
+    lock_path = os.path.join(path, LOCK_FILE)
+    while True:
+        os.makedirs(path, exist_ok=True)
+        try:
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT)
+        except FileNotFoundError: # directory removed by its previous holder in the meantime
+            continue
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return None
+        # The previous holder may have removed the directory before we got the lock
+        try:
+            if os.stat(lock_path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        _unlock(fd)
+
+
+def _unlock(fd):
+    if not fcntl:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+    os.close(fd)
+
+
+def _remove_locked(path, fd):
+    """
+    Removes a run directory whose lock is held by fd, then releases the lock.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    _unlock(fd)
+    if os.path.isdir(path): # Windows cannot remove the open lock file
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class RunWorkspace:
+    """
+    A private scratch directory for one pipeline run. Unnamed workspaces are
+    throwaway and default to tmpfs; named ones default to DEFAULT_RUNS_ROOT on disk.
+
+    Use as a context manager; the directory is removed on exit, whether the run
+    succeeded or failed:
+
+        with RunWorkspace() as ws:
+            frame_dir = ws.subdir("frames")
+
+    For resumable runs pass a stable `name` (the directory is reused if it
+    exists) and keep_on_failure=True, or call keep(), so checkpoints survive
+    a failed or interrupted run. A named directory is locked while in use;
+    entering one that another process holds raises RunLockedError.
+    """
+    def __init__(self, root=None, prefix="mixrun_", name=None, keep_on_failure=False):
+        self.root = root or (DEFAULT_RUNS_ROOT if name else default_work_root())
+        self.prefix = prefix
+        self.name = name
+        self.keep_on_failure = keep_on_failure
+        self.path = None
+        self._keep = False
+        self._lock_fd = None
+
+    def __enter__(self):
+        os.makedirs(self.root, exist_ok=True)
+        if self.name:
+            path = os.path.join(self.root, self.name)
+            self._lock_fd = _try_lock(path)
+            if self._lock_fd is None:
+                raise RunLockedError(f"Run is already in progress in another process: {path}")
+            self.path = path
+        else:
+            self.path = tempfile.mkdtemp(prefix=self.prefix, dir=self.root)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._keep or (exc_type is not None and self.keep_on_failure):
+            self._release()
+            return False
+        self.cleanup()
+        return False
+
+    def keep(self):
+        """
+        Leaves the directory in place on exit (e.g. a failure handled by the caller).
+        """
+        self._keep = True
+
+    def subdir(self, name):
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def _release(self):
+        if self._lock_fd is not None:
+            _unlock(self._lock_fd)
+            self._lock_fd = None
+
+    def cleanup(self):
+        if self.path:
+            if self._lock_fd is not None:
+                _remove_locked(self.path, self._lock_fd)
+                self._lock_fd = None
+            else:
+                shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+
+def prune_stale_runs(root, max_age_sec=3 * 24 * 3600):
+    """
+    Removes kept run directories under root that have not been touched for max_age_sec.
+    Directories locked by a run in progress are skipped.
+    """
+    if not os.path.isdir(root):
+        return []
+    now = time.time()
+    removed = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path) and now - os.path.getmtime(path) > max_age_sec:
+                fd = _try_lock(path)
+                if fd is None:
+                    continue
+                _remove_locked(path, fd)
+                removed.append(path)
+        except OSError:
+            continue
+    return removed
+
+
+class OutputStore:
+    """
+    Directory for finished artifacts (mixes, videos) bounded by total size and age.
+
+    Files are evicted least-recently-used first; touch() marks a file as used.
+    """
+    def __init__(self, root="outputs", max_bytes=5 * 1024 ** 3, max_age_sec=7 * 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, filename):
+        return os.path.join(self.root, filename)
+
+    def touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def gc(self, protect=()):
+        """
+        Removes expired files, then the least recently used ones until the store fits max_bytes.
+        Paths in `protect` are never removed. Returns the removed paths.
+        """
+        protected = {os.path.abspath(p) for p in protect if p}
+        now = time.time()
+        removed = []
+        kept = []
+        for mtime, size, path in self._entries():
+            if os.path.abspath(path) in protected:
+                kept.append((mtime, size, path))
+            elif self.max_age_sec and now - mtime > self.max_age_sec:
+                self._remove(path, removed)
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, path in kept:
+            if not self.max_bytes or total <= self.max_bytes:
+                break
+            if os.path.abspath(path) in protected:
+                continue
+            if self._remove(path, removed):
+                total -= size
+        return removed
+
+    def _remove(self, path, removed):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Output GC error {path}: {e}")
+            return False
+        removed.append(path)
+        return True